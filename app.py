@@ -5,10 +5,11 @@
 
 import streamlit as st
 import pandas as pd
+import polars as pl
 import numpy as np
-import plotly.graph_objects as go
 from datetime import date
 import os
+from price_store import symbol_dir
 
 # ---------------- PAGE CONFIG ----------------
 st.set_page_config(
@@ -20,16 +21,40 @@ st.set_page_config(
 st.title("📊 NSE Quant Stock Dashboard (Database Mode)")
 
 # ---------------- LOAD NSE UNIVERSE ----------------
-@st.cache_data(ttl=86400)
+UNIVERSE_CSV = "nse_universe.csv"
+UNIVERSE_PARQUET = "nse_universe.parquet"
+
+# Shared across sessions: the frame is read-only once loaded
+@st.cache_resource(ttl=86400)
 def load_universe():
     try:
-        df = pd.read_csv("nse_universe.csv")
-        return df.sort_values("Company")
-    except:
+        # Reuse the parsed copy unless the CSV has changed since it was written
+        if (os.path.exists(UNIVERSE_PARQUET) and
+                os.path.getmtime(UNIVERSE_PARQUET) >= os.path.getmtime(UNIVERSE_CSV)):
+            df = pl.read_parquet(UNIVERSE_PARQUET)
+        else:
+            df = (
+                pl.read_csv(
+                    UNIVERSE_CSV,
+                    columns=["Company", "Symbol"],
+                    schema_overrides={"Company": pl.String, "Symbol": pl.String}
+                )
+                .unique(subset="Company", keep="first", maintain_order=True)
+                .sort("Company", maintain_order=True)
+            )
+            try:
+                df.write_parquet(UNIVERSE_PARQUET, compression="zstd")
+            except OSError:
+                pass  # read-only deploy: keep serving from the CSV
+        symbol_by_company = dict(zip(df["Company"], df["Symbol"]))
+        # Arrow-backed string columns instead of Python object dtype
+        return df.to_pandas(use_pyarrow_extension_array=True), symbol_by_company
+    except (OSError, pl.exceptions.PolarsError):
+        # Missing / unreadable universe file or missing columns
         st.error("Run update_nse_universe.py first.")
-        return pd.DataFrame()
+        return pd.DataFrame(), {}
 
-companies_df = load_universe()
+companies_df, symbol_by_company = load_universe()
 
 if companies_df.empty:
     st.stop()
@@ -42,77 +67,133 @@ company = st.sidebar.selectbox(
     companies_df["Company"]
 )
 
-symbol = companies_df.loc[
-    companies_df["Company"] == company,
-    "Symbol"
-].values[0]
+symbol = symbol_by_company[company]
 
 start_date = st.sidebar.date_input("Start Date", date(2023, 1, 1))
 end_date = st.sidebar.date_input("End Date", date.today())
 
 # ---------------- LOAD PRICE DATA FROM DATABASE ----------------
+# Imported once the sidebar is up: this starts the numba warm-up in a
+# background thread while the price file is read
+from kernels import quant_stats, lttb_indices
+
+def price_dir(symbol):
+    # One directory of Parquet fragments per symbol (see price_store.py)
+    return symbol_dir("price_db", symbol)
+
+# mtime is only part of the cache key: a new fragment changes the
+# directory mtime, so the next call misses instead of returning the
+# pre-update frame for the rest of the TTL
 @st.cache_data(ttl=60)
-def load_price_data(symbol):
+def load_price_data(symbol, mtime):
 
-    file_path = f"price_db/{symbol}.csv"
+    path = price_dir(symbol)
 
-    if not os.path.exists(file_path):
+    if not os.path.exists(path):
         return None
 
-    df = pd.read_csv(file_path, index_col=0, parse_dates=True)
+    # Only reached on a cache miss with data on disk, so this counts
+    # real reads
+    st.session_state["cache_stats"]["misses"] += 1
+
+    # A compaction in update_prices.py can delete a fragment between
+    # listing the directory and reading it; the second listing sees
+    # the merged file instead
+    try:
+        df = pd.read_parquet(path)
+    except FileNotFoundError:
+        df = pd.read_parquet(path)
+    df = df.set_index("Date")
+
+    # The date filter below relies on a sorted index
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index(kind="mergesort")
+
+    # A batch replayed after a crashed update can store a date twice;
+    # the stable sort keeps fragment order, so the later copy wins
+    if df.index.has_duplicates:
+        df = df[~df.index.duplicated(keep="last")]
 
     if isinstance(df.columns, pd.MultiIndex):
         df.columns = df.columns.get_level_values(0)
 
+    # Fall back to another close column with at most one rename
     if "Close" not in df.columns:
-        return None
+        alias = next((c for c in ("Adj Close", "close") if c in df.columns), None)
+        if alias is None:
+            return None
+        df = df.rename(columns={alias: "Close"})
+
+    # float32 halves the cached frame and the chart payload; its rounding
+    # error stays below the 0.05-INR tick at NSE price levels, which is
+    # plenty for charting
+    for col in ("Open", "High", "Low", "Close"):
+        if col in df.columns:
+            df[col] = df[col].astype(np.float32)
 
     return df
 
-data = load_price_data(symbol)
+# Same symbol and no new fragments since the last rerun: reuse this
+# session's frame instead of paying cache_data's copy on every hit
+path = price_dir(symbol)
+mtime = os.path.getmtime(path) if os.path.exists(path) else None
+price_key = (symbol, mtime)
+
+# Per-session lookups vs. actual reads, to judge the TTL / reuse above
+cache_stats = st.session_state.setdefault(
+    "cache_stats", {"lookups": 0, "misses": 0}
+)
+if mtime is not None:
+    cache_stats["lookups"] += 1
+
+if st.session_state.get("price_key") == price_key:
+    data = st.session_state["price_data"]
+else:
+    data = load_price_data(symbol, mtime)
+    st.session_state["price_key"] = price_key
+    st.session_state["price_data"] = data
 
 if data is None:
     st.error("No local price data found. Run update_prices.py first.")
     st.stop()
 
-# Filter date range
-data = data[(data.index >= pd.to_datetime(start_date)) &
-            (data.index <= pd.to_datetime(end_date))]
+with st.sidebar.expander("🗄️ Cache Stats"):
+    hits = cache_stats["lookups"] - cache_stats["misses"]
+    st.metric("Cache hit rate", f"{hits / cache_stats['lookups']:.0%}")
+    st.caption(f"{cache_stats['lookups']} lookups, "
+               f"{cache_stats['misses']} disk reads")
+
+# Filter date range: two binary searches on the sorted index and a
+# positional slice, instead of full-length boolean masks
+i0 = data.index.searchsorted(pd.Timestamp(start_date), side="left")
+i1 = data.index.searchsorted(pd.Timestamp(end_date), side="right")
+data = data.iloc[i0:i1]
 
 if len(data) < 50:
     st.warning("Not enough historical data for analysis.")
     st.stop()
 
 # ---------------- QUANT CALCULATIONS ----------------
-data["Return"] = data["Close"].pct_change()
-data["MA20"] = data["Close"].rolling(20).mean()
-data["MA50"] = data["Close"].rolling(50).mean()
+# Prices are stored as float32; the kernel gets a float64 copy so its
+# reductions keep full precision
+close = data["Close"].to_numpy(dtype=np.float64)
 
-annual_return = (data["Close"].iloc[-1] /
-                 data["Close"].iloc[0]) - 1
+# MAs, return stats, crossover and score in one compiled call
+ma20, ma50, annual_return, volatility, sharpe, buy, score = quant_stats(close)
 
-volatility = data["Return"].std() * np.sqrt(252)
-sharpe = annual_return / volatility if volatility != 0 else 0
+# assign() leaves the cached / session frame untouched
+data = data.assign(
+    MA20=ma20.astype(np.float32),
+    MA50=ma50.astype(np.float32)
+)
 
-signal = "BUY" if data["MA20"].iloc[-1] > \
-    data["MA50"].iloc[-1] else "SELL"
+signal = "BUY" if buy else "SELL"
 
 # ---------------- SCORING ----------------
-score = 0
-if annual_return > 0:
-    score += 1
-if volatility < 0.4:
-    score += 1
-if sharpe > 1:
-    score += 1
-if signal == "BUY":
-    score += 1
-
-rating = (
-    "Strong Buy" if score >= 3
-    else "Watchlist" if score == 2
-    else "Avoid"
-)
+# Indexed by score (0-4)
+RATINGS = ("Avoid", "Avoid", "Watchlist", "Strong Buy", "Strong Buy")
+
+rating = RATINGS[score]
 
 # ---------------- METRICS ----------------
 st.subheader("📈 Quant Metrics")
@@ -124,30 +205,29 @@ col2.metric("Volatility", f"{volatility*100:.2f}%")
 col3.metric("Sharpe Ratio", f"{sharpe:.2f}")
 col4.metric("Signal", signal)
 
+st.caption("Volatility and Sharpe (return over volatility) use the "
+           "trailing 252 trading days of the selected range; Annual "
+           "Return covers the whole range.")
+
 st.write("### Rating:", rating)
 
 # ---------------- CHART ----------------
+import plotly.graph_objects as go
+
 st.subheader("📊 Price Chart")
 
-fig = go.Figure()
-
-fig.add_trace(go.Scatter(
-    x=data.index,
-    y=data["Close"],
-    name="Close"
-))
-
-fig.add_trace(go.Scatter(
-    x=data.index,
-    y=data["MA20"],
-    name="MA20"
-))
-
-fig.add_trace(go.Scatter(
-    x=data.index,
-    y=data["MA50"],
-    name="MA50"
-))
+# Long ranges are thinned to ~1000 points (LTTB on Close, same rows
+# kept for the MAs) before being shipped to the browser
+chart = data
+if len(data) > 1500:
+    keep = lttb_indices(data.index.asi8.astype(np.float64), close, 1000)
+    chart = data.iloc[keep]
+
+# WebGL traces, built in one go instead of three add_trace calls
+fig = go.Figure(data=[
+    go.Scattergl(x=chart.index, y=chart[col], name=col)
+    for col in ("Close", "MA20", "MA50")
+])
 
 fig.update_layout(
     template="plotly_dark",
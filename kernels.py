@@ -0,0 +1,131 @@
+# ======================================================
+# NSE QUANT DASHBOARD – COMPILED KERNELS
+# Numba versions of the per-stock quant math used by app.py
+# ======================================================
+
+import math
+import threading
+from typing import NamedTuple
+
+import numpy as np
+from numba import njit
+
+SQRT252 = math.sqrt(252)
+VOL_WINDOW = 252   # volatility uses the trailing year of daily returns
+
+
+# ---------------- QUANT KERNEL ----------------
+@njit(cache=True)
+def quant_kernel(close):
+    n = close.size
+    ma20 = np.empty(n)
+    ma50 = np.empty(n)
+
+    # Single pass over Close: running sums for both moving averages
+    # (add the new price, drop the one that left each window) and a
+    # Welford running mean / variance of the last VOL_WINDOW daily returns
+    r0 = max(1, n - VOL_WINDOW)
+    s20 = 0.0
+    s50 = 0.0
+    mean = 0.0
+    m2 = 0.0
+    for i in range(n):
+        x = close[i]
+
+        s20 += x
+        s50 += x
+        if i >= 20:
+            s20 -= close[i - 20]
+        if i >= 50:
+            s50 -= close[i - 50]
+        ma20[i] = s20 / 20 if i >= 19 else np.nan
+        ma50[i] = s50 / 50 if i >= 49 else np.nan
+
+        if i >= r0:
+            r = x / close[i - 1] - 1.0
+            d = r - mean
+            mean += d / (i - r0 + 1)
+            m2 += d * (r - mean)
+
+    ann_ret = close[-1] / close[0] - 1.0
+
+    # Sample std (ddof=1) over the windowed returns, annualised
+    n_ret = n - r0
+    vol = math.sqrt(m2 / (n_ret - 1)) * SQRT252 if n_ret > 1 else 0.0
+
+    # Sharpe's numerator covers the same window as vol: the return
+    # from the close before the first windowed return to the last close
+    window_ret = close[-1] / close[r0 - 1] - 1.0
+    sharpe = window_ret / vol if vol != 0.0 else 0.0
+
+    buy = ma20[-1] > ma50[-1]
+
+    score = (int(ann_ret > 0) + int(vol < 0.4) +
+             int(sharpe > 1) + int(buy))
+
+    return ma20, ma50, ann_ret, vol, sharpe, buy, score
+
+
+class QuantStats(NamedTuple):
+    ma20: np.ndarray
+    ma50: np.ndarray
+    annual_return: float
+    volatility: float
+    sharpe: float
+    buy: bool
+    score: int
+
+
+def quant_stats(close):
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    return QuantStats(*quant_kernel(close))
+
+
+# ---------------- CHART DOWNSAMPLING ----------------
+@njit(cache=True)
+def lttb_indices(x, y, n_out):
+    # Largest-Triangle-Three-Buckets: keep the first and last points and,
+    # from each bucket in between, the point forming the largest triangle
+    # with the previous pick and the next bucket's average
+    n = x.size
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0] = 0
+    every = (n - 2) / (n_out - 2)
+    a = 0
+
+    for i in range(n_out - 2):
+        nxt_start = int((i + 1) * every) + 1
+        nxt_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[nxt_start:nxt_end].mean()
+        avg_y = y[nxt_start:nxt_end].mean()
+
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        best = start
+        best_area = -1.0
+        for j in range(start, end):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) -
+                       (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best_area = area
+                best = j
+
+        idx[i + 1] = best
+        a = best
+
+    idx[n_out - 1] = n - 1
+    return idx
+
+
+# ---------------- JIT WARM-UP ----------------
+# Compile (or load from numba's on-disk cache) in the background as soon
+# as the module is imported, so the first price fetch doesn't wait on it.
+# Argument types match what app.py passes: C-contiguous float64 arrays.
+def _warm_up():
+    quant_kernel(np.ones(60))
+    lttb_indices(np.arange(4.0), np.ones(4), 3)
+
+threading.Thread(target=_warm_up, daemon=True).start()
@@ -0,0 +1,94 @@
+import pandas as pd
+import os
+import glob
+import shutil
+from urllib.parse import unquote
+from price_store import symbol_dir
+
+print("🚚 Migrating price_db to the partitioned Parquet store...")
+
+# ---------------- LOCATE DATABASE ----------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+price_db_path = os.path.join(BASE_DIR, "price_db")
+
+# Per-symbol files from older layouts: {symbol}.csv, then {symbol}.parquet.
+# When both exist the Parquet file is a superset (update_prices.py folded
+# the CSV into it), and sorting processes it last so it wins.
+legacy_files = sorted(
+    glob.glob(os.path.join(price_db_path, "*.csv")) +
+    glob.glob(os.path.join(price_db_path, "[!_]*.parquet"))
+)
+
+print(f"Legacy files: {len(legacy_files)}")
+
+# ---------------- CONVERT ----------------
+migrated = 0
+
+for path in legacy_files:
+
+    symbol, ext = os.path.splitext(os.path.basename(path))
+    part_dir = symbol_dir(price_db_path, symbol)
+
+    try:
+        if ext == ".csv":
+            df = pd.read_csv(path, index_col=0, parse_dates=True)
+        else:
+            df = pd.read_parquet(path)
+
+        if isinstance(df.columns, pd.MultiIndex):
+            df.columns = df.columns.get_level_values(0)
+
+        # Same layout update_prices.py appends: Date column + float64 values
+        rows = df.sort_index().rename_axis("Date").reset_index()
+        values = rows.columns.difference(["Date"])
+        rows[values] = rows[values].astype("float64")
+        rows["Date"] = rows["Date"].astype("datetime64[ns]")
+
+        # The all-zero stamp sorts before every fragment update_prices.py writes
+        os.makedirs(part_dir, exist_ok=True)
+        rows.to_parquet(
+            os.path.join(part_dir, "part-00000000000000-legacy.parquet"),
+            index=False,
+            compression="zstd"
+        )
+
+        os.remove(path)
+        migrated += 1
+
+    except Exception as e:
+        print("❌ Failed:", os.path.basename(path), e)
+
+print(f"✅ Migrated {migrated} of {len(legacy_files)} files")
+
+# ---------------- FIX UNESCAPED DIRECTORIES ----------------
+# Earlier migrations wrote symbols like M&M to symbol=M&M while the
+# daily appends went to the escaped symbol=M%26M, splitting the history.
+# Move such fragments into the escaped directory; duplicate dates are
+# dropped on compaction and when the app loads the symbol.
+moved = 0
+
+for part_dir in glob.glob(os.path.join(price_db_path, "symbol=*")):
+
+    symbol = os.path.basename(part_dir).removeprefix("symbol=")
+    target = symbol_dir(price_db_path, symbol)
+
+    # Escaped names unescape to something else and are left alone
+    if unquote(symbol) != symbol or target == part_dir:
+        continue
+
+    try:
+        os.makedirs(target, exist_ok=True)
+        for part in glob.glob(os.path.join(part_dir, "*.parquet")):
+            shutil.move(part, os.path.join(target, os.path.basename(part)))
+        os.rmdir(part_dir)
+        moved += 1
+
+    except OSError as e:
+        print("❌ Failed:", os.path.basename(part_dir), e)
+
+# The sidecar index may hold keys from the split directories
+if moved:
+    last_date_file = os.path.join(price_db_path, "_last_date.parquet")
+    if os.path.exists(last_date_file):
+        os.remove(last_date_file)
+    print(f"✅ Merged {moved} unescaped symbol directories")
@@ -0,0 +1,21 @@
+# ======================================================
+# NSE QUANT DASHBOARD – PRICE STORE LAYOUT
+# Where each symbol's Parquet fragments live in price_db
+# ======================================================
+
+import os
+from urllib.parse import quote
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+# price_db is one Parquet dataset partitioned by symbol
+# (price_db/symbol=XYZ/*.parquet). pyarrow URI-escapes the value when it
+# writes (M&M -> symbol=M%26M) and unescapes it again when it reads.
+PARTITIONING = ds.HivePartitioning(pa.schema([("symbol", pa.string())]))
+
+
+def symbol_dir(price_db_path, symbol):
+    # Same escaping ds.write_dataset applies, so the app, compaction and
+    # the migration all use the directory the daily appends go to
+    return os.path.join(price_db_path, "symbol=" + quote(symbol, safe=""))
@@ -1,35 +1,205 @@
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 import yfinance as yf
 import os
+import glob
 import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from price_store import PARTITIONING, symbol_dir
+
+parser = argparse.ArgumentParser(description="Daily NSE price update")
+parser.add_argument("--force", action="store_true",
+                    help="request every symbol, even ones already current")
+args = parser.parse_args()
 
 print("🚀 Starting Ultra-Fast NSE Batch Price Update...")
 
 # ---------------- LOAD NSE UNIVERSE ----------------
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 universe_file = os.path.join(BASE_DIR, "nse_universe.csv")
+symbols_file = os.path.join(BASE_DIR, "nse_symbols.parquet")
 
 try:
-    stocks = pd.read_csv(universe_file)
-    symbols = stocks["Symbol"].dropna().unique()
+    # Reuse the binary symbol list unless the CSV has changed since
+    if (os.path.exists(symbols_file) and
+            os.path.getmtime(symbols_file) >= os.path.getmtime(universe_file)):
+        symbols = pd.read_parquet(symbols_file)["Symbol"].tolist()
+    else:
+        stocks = pd.read_csv(universe_file, usecols=["Symbol"], dtype=str)
+        symbols = stocks["Symbol"].dropna().unique().tolist()
+        try:
+            pd.DataFrame({"Symbol": symbols}).to_parquet(symbols_file, index=False)
+        except OSError:
+            pass  # read-only checkout: parse the CSV again next run
 except Exception as e:
     print("❌ Universe file missing:", e)
     exit()
 
-# Convert to Yahoo format
-tickers = [symbol + ".NS" for symbol in symbols]
-
 # ---------------- CREATE DATABASE FOLDER ----------------
 price_db_path = os.path.join(BASE_DIR, "price_db")
 os.makedirs(price_db_path, exist_ok=True)
 
+if (glob.glob(os.path.join(price_db_path, "*.csv")) or
+        glob.glob(os.path.join(price_db_path, "[!_]*.parquet"))):
+    print("❌ Old per-file price_db found. Run migrate_price_db.py first.")
+    exit()
+
+# ---------------- PRICE STORE ----------------
+# price_db is one Parquet dataset partitioned by symbol (layout in
+# price_store.py). Every run appends one fragment per symbol holding
+# only bars newer than the ones already stored.
+WRITE_OPTIONS = ds.ParquetFileFormat().make_write_options(compression="zstd")
+RUN_STAMP = time.strftime("%Y%m%d%H%M%S")
+COMPACT_AFTER = 30   # fragments per symbol before they are merged
+WRITE_WORKERS = 16   # parallel compaction writes (pyarrow I/O drops the GIL)
+
+# Sidecar index: symbol -> last stored bar. The leading "_" keeps it out
+# of pyarrow's dataset discovery.
+LAST_DATE_FILE = os.path.join(price_db_path, "_last_date.parquet")
+
+def last_stored_dates():
+    # Latest stored bar per symbol, from the sidecar index when present
+    if os.path.exists(LAST_DATE_FILE):
+        index_df = pd.read_parquet(LAST_DATE_FILE)
+        return dict(zip(index_df["symbol"], index_df["Date"]))
+
+    if not os.listdir(price_db_path):
+        return {}
+
+    # No index yet: rebuild it from the Date column of every fragment
+    dates = ds.dataset(
+        price_db_path, format="parquet", partitioning=PARTITIONING
+    ).to_table(columns=["symbol", "Date"]).to_pandas()
+
+    return dates.groupby("symbol")["Date"].max().to_dict()
+
+def save_last_dates():
+    # Write beside the index and swap it in, so a crash mid-write never
+    # leaves a truncated sidecar behind
+    tmp = LAST_DATE_FILE + ".tmp"
+    pd.DataFrame({
+        "symbol": list(last_dates.keys()),
+        "Date": list(last_dates.values())
+    }).to_parquet(tmp, index=False)
+    os.replace(tmp, LAST_DATE_FILE)
+
+def append_rows(rows, batch_no):
+    # rows: long table with Date, symbol and the price columns
+    # Fixed column types so every fragment of a symbol shares one schema
+    values = rows.columns.difference(["Date", "symbol"])
+    rows = rows.astype({**dict.fromkeys(values, "float64"),
+                        "Date": "datetime64[ns]"})
+
+    ds.write_dataset(
+        pa.Table.from_pandas(rows, preserve_index=False),
+        price_db_path,
+        format="parquet",
+        partitioning=PARTITIONING,
+        basename_template=f"part-{RUN_STAMP}-{batch_no}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        file_options=WRITE_OPTIONS
+    )
+
+def compact(symbol):
+    # Merge a symbol's daily fragments into one file once they pile up
+    part_dir = symbol_dir(price_db_path, symbol)
+    parts = glob.glob(os.path.join(part_dir, "part-*.parquet"))
+
+    if len(parts) <= COMPACT_AFTER:
+        return
+
+    # Fragments are read oldest first, so if a crashed run was replayed
+    # the later copy of a date wins
+    df = (
+        pq.read_table(sorted(parts), partitioning=None).to_pandas()
+        .drop_duplicates("Date", keep="last")
+        .sort_values("Date", kind="mergesort")
+    )
+    # Written under a "_" name, which dataset discovery skips, and swapped
+    # in whole: a reader never sees a half-written merged file. Between
+    # the swap and the removals it sees each date twice, which the app's
+    # loader drops.
+    tmp = os.path.join(part_dir, "_compact.parquet.tmp")
+    pq.write_table(
+        pa.Table.from_pandas(df, preserve_index=False),
+        tmp,
+        compression="zstd"
+    )
+    os.replace(
+        tmp, os.path.join(part_dir, f"part-{RUN_STAMP}-compact.parquet")
+    )
+
+    for part in parts:
+        os.remove(part)
+
+last_dates = last_stored_dates()
+
+if last_dates and not os.path.exists(LAST_DATE_FILE):
+    save_last_dates()
+
+# Symbols that already hold today's bar need no request at all.
+# The sidecar is keyed by bare symbol, so filter on that and add the
+# Yahoo ".NS" suffix only to the ones left.
+# "Today" is the exchange's date, whatever timezone the job runs in;
+# stored bars are naive NSE session dates.
+now = pd.Timestamp.now(tz="Asia/Kolkata")
+today = now.normalize().tz_localize(None)
+pending = [
+    symbol for symbol in symbols
+    if args.force or last_dates.get(symbol, pd.Timestamp.min) < today
+]
+tickers = [symbol + ".NS" for symbol in pending]
+
+# Before the 15:30 IST close Yahoo's bar for today is an intraday
+# snapshot. Storing it would mark the symbol current and the Date > last
+# filter would then never let the real close in, so it is not stored.
+MARKET_CLOSE = pd.Timedelta(hours=15, minutes=30)
+session_open = now - now.normalize() < MARKET_CLOSE
+
 # ---------------- BATCH SETTINGS ----------------
-BATCH_SIZE = 50   # 50 tickers per request
+BATCH_SIZE = 100  # 100 tickers per yf.download call
+MAX_RETRIES = 4   # throttled batches are retried with exponential backoff
 TOTAL = len(tickers)
 
 print(f"Total Stocks: {TOTAL}")
 print(f"Batch Size: {BATCH_SIZE}")
 
+# ---------------- DOWNLOAD HELPER ----------------
+def fetch_many(tickers):
+    # One batched yf.download for the last 5 sessions of many tickers;
+    # Yahoo fetches them in parallel and returns a (ticker, field)
+    # column MultiIndex
+    return yf.download(
+        " ".join(tickers),
+        period="5d",
+        interval="1d",
+        group_by="ticker",
+        threads=True,
+        progress=False
+    )
+
+def fetch_with_backoff(tickers, expect_data):
+    # yf.download logs rate-limit errors per ticker instead of raising.
+    # A batch holding symbols Yahoo has served before (expect_data) that
+    # comes back with no data at all is treated as throttled and retried
+    # after 1s, 2s, 4s, ... A batch of only never-stored symbols (e.g.
+    # delisted ones left pending on a same-day rerun) is empty anyway.
+    for attempt in range(MAX_RETRIES):
+        df = fetch_many(tickers)
+
+        if not df.dropna(how="all").empty or not expect_data:
+            return df
+
+        if attempt < MAX_RETRIES - 1:
+            wait = 2 ** attempt
+            print(f"⏳ Empty batch, retrying in {wait}s")
+            time.sleep(wait)
+
+    return df
+
 # ---------------- DOWNLOAD IN BATCHES ----------------
 for i in range(0, TOTAL, BATCH_SIZE):
 
@@ -38,38 +208,55 @@ for i in range(0, TOTAL, BATCH_SIZE):
     print(f"📦 Downloading batch {i} to {i+len(batch)}")
 
     try:
-        df = yf.download(
-            batch,
-            period="5d",
-            interval="1d",
-            group_by="ticker",
-            threads=True,
-            progress=False
+        expect_data = any(
+            symbol in last_dates for symbol in pending[i:i+BATCH_SIZE]
         )
+        df = fetch_with_backoff(batch, expect_data)
 
-        for ticker in batch:
-            symbol = ticker.replace(".NS", "")
-            file_path = os.path.join(price_db_path, f"{symbol}.csv")
+        # One stack turns the (ticker, field) columns into a long table of
+        # (date, ticker) rows, instead of slicing df[ticker] per ticker.
+        # Tickers Yahoo returned nothing for simply produce no rows.
+        long = df.stack(level=0, future_stack=True).dropna()
+        long.index.names = ["Date", "Ticker"]
 
-            try:
-                if ticker not in df:
-                    continue
+        # Report those tickers by name instead of dropping them silently
+        returned = set(long.index.get_level_values("Ticker"))
+        missing = [ticker for ticker in batch if ticker not in returned]
+        if missing:
+            print(f"⚠️ No data for {len(missing)} tickers:", ", ".join(missing))
 
-                stock_df = df[ticker].dropna()
+        rows = long.reset_index()
+        rows["symbol"] = rows.pop("Ticker").str.removesuffix(".NS")
 
-                if stock_df.empty:
-                    continue
+        # Keep only bars newer than what is already stored
+        last = pd.to_datetime(rows["symbol"].map(last_dates))
+        rows = rows[last.isna() | (rows["Date"] > last)]
 
-                if os.path.exists(file_path):
-                    old = pd.read_csv(file_path, index_col=0, parse_dates=True)
-                    stock_df = pd.concat([old, stock_df]).drop_duplicates()
+        if session_open:
+            rows = rows[rows["Date"] < today]
 
-                stock_df.to_csv(file_path)
+        if not rows.empty:
+            # One dataset write per batch instead of one file per ticker
+            append_rows(rows, i // BATCH_SIZE)
 
-            except:
-                continue
+            # Saved per batch, so an interrupted run loses at most this
+            # batch's update; rows the next run re-appends are dropped
+            # as duplicate dates on compaction and in app.py's loader
+            last_dates.update(rows.groupby("symbol")["Date"].max().to_dict())
+            save_last_dates()
 
-        time.sleep(1)  # small pause to avoid rate limit
+            # Symbols fill up at the same pace, so compaction tends to hit
+            # a whole batch at once; run those rewrites in parallel
+            with ThreadPoolExecutor(max_workers=WRITE_WORKERS) as pool:
+                futures = {
+                    pool.submit(compact, symbol): symbol
+                    for symbol in rows["symbol"].unique()
+                }
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        print("❌ Compaction failed:", futures[future], e)
 
     except Exception as e:
         print("Batch failed:", e)